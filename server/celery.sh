@@ -2,4 +2,8 @@
 
 celery -A celeryconf -l info beat &
 celery -A celeryconf -l info -c 4 -n cron@%h -Q cron worker &
+# If ec2spotmanager.tasks.check_instance_pool is routed to the ec2spot queue (see CELERY_TASK_ROUTES
+# in settings), run a worker for it. Pool checks mostly wait on EC2, redis and the database, so run
+# more of them than we have CPUs.
+# celery -A celeryconf -l info -c 16 -n ec2spot@%h -Q ec2spot worker &
 celery -A celeryconf -l info -n worker@%h -Q celery worker
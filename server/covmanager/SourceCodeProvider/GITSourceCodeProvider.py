@@ -21,6 +21,8 @@ from .SourceCodeProvider import SourceCodeProvider, UnknownRevisionException, Un
 
 
 class GITSourceCodeProvider(SourceCodeProvider):
+    __slots__ = ()
+
     def __init__(self, location):
         super(GITSourceCodeProvider, self).__init__(location)
 
@@ -22,6 +22,8 @@ from .SourceCodeProvider import SourceCodeProvider, UnknownRevisionException, Un
 
 
 class HGSourceCodeProvider(SourceCodeProvider):
+    __slots__ = ()
+
     def __init__(self, location):
         super(HGSourceCodeProvider, self).__init__(location)
 
@@ -32,7 +32,12 @@ class UnknownFilenameException(Exception):
 class SourceCodeProvider():
     '''
     Abstract base class that defines what interfaces Source Code Providers must implement
+
+    Providers are instantiated for each use, so they don't carry a per-instance
+    __dict__. Subclasses that need additional state must declare it in __slots__.
     '''
+    __slots__ = ("location",)
+
     def __init__(self, location):
         self.location = location
 
@@ -30,8 +30,8 @@ class Command(BaseCommand):
         provider = {"git": "GITSourceCodeProvider",
                     "hg": "HGSourceCodeProvider"}.get(provider, provider)
         try:
-            __import__('covmanager.SourceCodeProvider.%s' % provider, fromlist=[provider.encode("utf-8")])
-        except ImportError:
+            Repository.getProviderClass(provider)
+        except (ImportError, AttributeError):
             raise CommandError("Error: '%s' is not a valid source code provider!" % provider)
 
         if not location:
@@ -20,11 +20,22 @@ class Repository(models.Model):
     name = models.CharField(max_length=255, blank=False)
     location = models.CharField(max_length=1023, blank=False)
 
+    # SourceCodeProvider classes that have been loaded already, by class name
+    providerClasses = {}
+
+    @staticmethod
+    def getProviderClass(classname):
+        providerClass = Repository.providerClasses.get(classname)
+        if providerClass is None:
+            # Dynamically load the provider as requested and remember it,
+            # so we don't go through the import machinery on every call.
+            providerModule = __import__('covmanager.SourceCodeProvider.%s' % classname, fromlist=[classname])
+            providerClass = getattr(providerModule, classname)
+            Repository.providerClasses[classname] = providerClass
+        return providerClass
+
     def getInstance(self):
-        # Dynamically instantiate the provider as requested
-        providerModule = __import__('covmanager.SourceCodeProvider.%s' % self.classname, fromlist=[self.classname])
-        providerClass = getattr(providerModule, self.classname)
-        return providerClass(self.location)
+        return Repository.getProviderClass(self.classname)(self.location)
 
 
 class CollectionFile(models.Model):
@@ -142,12 +153,12 @@ class Collection(models.Model):
                          must create a copy and pass it to this method instead.
         """
         if "children" in coverage:
-            for child in coverage["children"]:
-                if "children" in coverage["children"][child]:
+            for child in coverage["children"].values():
+                if "children" in child:
                     # We don't remove the "children" key here because it is
                     # still required (e.g. by the UI) to determine if a child
                     # is a folder itself or not.
-                    coverage["children"][child]["children"] = True
+                    child["children"] = True
 
     @staticmethod
     def strip(coverage):
@@ -161,15 +172,19 @@ class Collection(models.Model):
                          for performance. If you need the original object, you
                          must create a copy and pass it to this method instead.
         """
-        if "children" in coverage and type(coverage["children"]) != bool:
-            for child in coverage["children"]:
-                Collection.strip(coverage["children"][child])
-        else:
-            # This is a leaf, so we need to delete coverage data.
-            # However, passing in an already stripped object to this
-            # method shouldn't error, so we accept the error that the
-            # coverage field might not be present.
-            coverage.pop("coverage", None)
+        # Walk the tree with an explicit stack rather than recursion, modifying
+        # each node in place.
+        nodes = [coverage]
+        while nodes:
+            node = nodes.pop()
+            if "children" in node and type(node["children"]) != bool:
+                nodes.extend(node["children"].values())
+            else:
+                # This is a leaf, so we need to delete coverage data.
+                # However, passing in an already stripped object to this
+                # method shouldn't error, so we accept the error that the
+                # coverage field might not be present.
+                node.pop("coverage", None)
 
 
 # This post_delete handler ensures that the corresponding coverage
@@ -147,3 +147,16 @@ class CollectionsBrowseApiViewTests(TestCase):
         response = self.client.get(reverse(self.name, kwargs={'collectionid': col.pk, 'path': ''}))
         log.debug(response)
         self.assertEqual(response.status_code, requests.codes['ok'])
+
+    def test_etag(self):
+        """Requests with a matching ETag are answered with 304 Not Modified"""
+        self.client.login(username='test', password='test')
+        repo = self.create_repository("git")
+        col = self.create_collection(repository=repo)
+        path = reverse(self.name, kwargs={'collectionid': col.pk, 'path': ''})
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, requests.codes['ok'])
+        self.assertIn('ETag', response)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+        log.debug(response)
+        self.assertEqual(response.status_code, requests.codes['not_modified'])
@@ -104,8 +104,7 @@ class RestCollectionsTests(APITestCase, TestCase):
         log.debug(resp)
         self.assertEqual(resp.status_code, requests.codes['ok'])
         resp = json.loads(resp.content.decode('utf-8'))
-        self.assertEqual(set(resp.keys()), {'count', 'previous', 'results', 'next'})
-        self.assertEqual(resp['count'], 1)
+        self.assertEqual(set(resp.keys()), {'previous', 'results', 'next'})
         self.assertIsNone(resp['previous'])
         self.assertIsNone(resp['next'])
         self.assertEqual(len(resp['results']), 1)
@@ -124,6 +123,23 @@ class RestCollectionsTests(APITestCase, TestCase):
         self.assertEqual(resp['revision'], 'abc')
         self.assertEqual(resp['coverage'], coll.coverage.file)
 
+    def test_get_paginated(self):
+        """get returns collections newest first and follows the cursor to the next page"""
+        repo = self.create_repository('git', name='testrepo')
+        colls = [self.create_collection(repository=repo, revision='rev%d' % i) for i in range(3)]
+        user = User.objects.get(username='test')
+        self.client.force_authenticate(user=user)
+        resp = self.client.get('/covmanager/rest/collections/', {'limit': 2})
+        self.assertEqual(resp.status_code, requests.codes['ok'])
+        resp = json.loads(resp.content.decode('utf-8'))
+        self.assertEqual([coll['id'] for coll in resp['results']], [colls[2].pk, colls[1].pk])
+        self.assertIsNotNone(resp['next'])
+        resp = self.client.get(resp['next'])
+        self.assertEqual(resp.status_code, requests.codes['ok'])
+        resp = json.loads(resp.content.decode('utf-8'))
+        self.assertEqual([coll['id'] for coll in resp['results']], [colls[0].pk])
+        self.assertIsNone(resp['next'])
+
 
 class RestCollectionTests(APITestCase, TestCase):
 
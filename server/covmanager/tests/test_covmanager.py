@@ -15,6 +15,7 @@ import logging
 from django.core.urlresolvers import reverse
 
 from . import TestCase
+from ..models import Collection
 
 
 log = logging.getLogger("fm.covmanager.tests.covmanager")  # pylint: disable=invalid-name
@@ -27,4 +28,24 @@ class CovManagerTests(TestCase):
         self.client.login(username='test', password='test')
         self.assertRedirects(self.client.get(reverse('covmanager:index')), reverse('covmanager:collections'))
 
+    def test_strip(self):
+        """Collection.strip removes detailed coverage from all leaves in place"""
+        coverage = {"linesTotal": 3, "children": {
+            "a.c": {"linesTotal": 1, "coverage": [-1, 1]},
+            "sub": {"linesTotal": 2, "children": {
+                "b.c": {"linesTotal": 2, "coverage": [1, 0]},
+                "stripped.c": {"linesTotal": 0},
+            }},
+            "folded": {"linesTotal": 0, "children": True},
+        }}
+        Collection.strip(coverage)
+        self.assertEqual(coverage, {"linesTotal": 3, "children": {
+            "a.c": {"linesTotal": 1},
+            "sub": {"linesTotal": 2, "children": {
+                "b.c": {"linesTotal": 2},
+                "stripped.c": {"linesTotal": 0},
+            }},
+            "folded": {"linesTotal": 0, "children": True},
+        }})
+
 #url(r'^tools/search/api/$', views.tools_search_api, name="tools_search_api"),
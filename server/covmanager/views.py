@@ -1,16 +1,24 @@
 from django.core.exceptions import SuspiciousOperation
 from django.db.models import Q
 from django.http import Http404
-from django.http.response import HttpResponse
+from django.http.response import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views.decorators.csrf import csrf_exempt
+import hashlib
 import json
 import os
 from rest_framework import mixins, viewsets, filters
 from rest_framework.authentication import TokenAuthentication, \
     SessionAuthentication
+from rest_framework.pagination import CursorPagination
 from wsgiref.util import FileWrapper
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from server.views import JsonQueryFilterBackend, SimpleQueryFilterBackend
 
 from .models import Collection, Repository, ReportConfiguration, ReportSummary
@@ -21,6 +29,10 @@ from crashmanager.models import Tool
 from .SourceCodeProvider import SourceCodeProvider
 
 
+# Omit the whitespace that the json module emits by default after separators
+JSON_COMPACT_SEPARATORS = (',', ':')
+
+
 def index(request):
     return redirect('covmanager:collections')
 
@@ -80,6 +92,22 @@ def collections_browse_api(request, collectionid, path):
     if "rc" in request.GET:
         report_configuration = get_object_or_404(ReportConfiguration, pk=request.GET["rc"])
 
+    # The coverage of a collection never changes once it has been created, so the
+    # response only depends on the path and the directives of the report configuration.
+    etag_data = [str(collection.pk), str(collection.coverage_id), path]
+    if report_configuration is not None:
+        etag_data.append(report_configuration.directives)
+    etag = '"%s"' % hashlib.sha1("\0".join(etag_data).encode("utf-8")).hexdigest()
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _collections_browse_api_response(collection, path, report_configuration)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
+
+
+def _collections_browse_api_response(collection, path, report_configuration):
     coverage = collection.subset(path, report_configuration)
 
     if not coverage:
@@ -94,7 +122,21 @@ def collections_browse_api(request, collectionid, path):
         collection.annotateSource(path, coverage)
 
     data = {"path": path, "coverage": coverage}
-    return HttpResponse(json.dumps(data), content_type='application/json')
+
+    if orjson is None and "children" in coverage:
+        # Directory data can be large, so stream the encoded data while walking
+        # the coverage tree instead of building the whole JSON string in memory first.
+        encoder = json.JSONEncoder(separators=JSON_COMPACT_SEPARATORS)
+        return StreamingHttpResponse(encoder.iterencode(data), content_type='application/json')
+
+    if orjson is not None:
+        # orjson encodes considerably faster than the stdlib encoder and
+        # directly gives us the bytes we need for the response body.
+        response = HttpResponse(orjson.dumps(data), content_type='application/json')
+    else:
+        response = JsonResponse(data, json_dumps_params={'separators': JSON_COMPACT_SEPARATORS})
+
+    return response
 
 
 def collections_diff_api(request, path):
@@ -502,7 +544,7 @@ class CollectionFilterBackend(filters.BaseFilterBackend):
         Return a filtered queryset.
         """
         # Return early on empty queryset
-        if not queryset:
+        if not queryset.exists():
             return queryset
 
         filters = {}
@@ -535,6 +577,16 @@ class CollectionFilterBackend(filters.BaseFilterBackend):
         return queryset.order_by('-pk')
 
 
+class CollectionCursorPagination(CursorPagination):
+    """
+    Paginates collections by seeking on the primary key rather than using an
+    offset, so deep pages don't require the database to skip over all
+    preceding rows.
+    """
+    ordering = '-pk'
+    page_size_query_param = 'limit'
+
+
 class CollectionViewSet(mixins.CreateModelMixin,
                         mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
@@ -543,9 +595,9 @@ class CollectionViewSet(mixins.CreateModelMixin,
     API endpoint that allows adding/viewing Collections
     """
     authentication_classes = (TokenAuthentication, SessionAuthentication)
-    queryset = Collection.objects.all()
+    queryset = Collection.objects.all().select_related('repository', 'client', 'coverage').prefetch_related('tools')
     serializer_class = CollectionSerializer
-    paginate_by_param = 'limit'
+    pagination_class = CollectionCursorPagination
     filter_backends = [
         JsonQueryFilterBackend,
         SimpleQueryFilterBackend,
@@ -574,7 +626,7 @@ class ReportConfigurationFilterBackend(filters.BaseFilterBackend):
         Return a filtered queryset.
         """
         # Return early on empty queryset
-        if not queryset:
+        if not queryset.exists():
             return queryset
 
         q = request.query_params.get("q", None)
@@ -597,6 +649,6 @@ class ReportConfigurationViewSet(mixins.CreateModelMixin,
     API endpoint that allows adding/updating/viewing Report Configurations
     """
     authentication_classes = (TokenAuthentication, SessionAuthentication)
-    queryset = ReportConfiguration.objects.all()
+    queryset = ReportConfiguration.objects.all().select_related('repository')
     serializer_class = ReportConfigurationSerializer
     filter_backends = [JsonQueryFilterBackend, SimpleQueryFilterBackend, ReportConfigurationFilterBackend]
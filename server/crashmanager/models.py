@@ -77,11 +77,22 @@ class BugProvider(models.Model):
     # This is used to annotate bugs with the URL linking to them
     urlTemplate = models.CharField(max_length=1023, blank=False)
 
+    # Bugtracker provider classes that have been loaded already, by class name
+    providerClasses = {}
+
+    @staticmethod
+    def getProviderClass(classname):
+        providerClass = BugProvider.providerClasses.get(classname)
+        if providerClass is None:
+            # Dynamically load the provider as requested and remember it,
+            # so we don't go through the import machinery on every call.
+            providerModule = __import__('crashmanager.Bugtracker.%s' % classname, fromlist=[classname])
+            providerClass = getattr(providerModule, classname)
+            BugProvider.providerClasses[classname] = providerClass
+        return providerClass
+
     def getInstance(self):
-        # Dynamically instantiate the provider as requested
-        providerModule = __import__('crashmanager.Bugtracker.%s' % self.classname, fromlist=[self.classname])
-        providerClass = getattr(providerModule, self.classname)
-        return providerClass(self.pk, self.hostname)
+        return BugProvider.getProviderClass(self.classname)(self.pk, self.hostname)
 
 
 class Bug(models.Model):
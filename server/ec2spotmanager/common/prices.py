@@ -12,23 +12,45 @@ file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 @contact:    choller@mozilla.com
 '''
+from collections import defaultdict
+from concurrent.futures import as_completed, ThreadPoolExecutor
 import datetime
 
 import botocore
+import botocore.config
 import boto3
+import numpy
 from django.utils import timezone
 
 
 # Blacklist zones that currently don't allow subnets to be set on them
 # until we found a better way to deal with this situation.
-zone_blacklist = ["us-east-1a", "us-east-1f"]
+zone_blacklist = frozenset(["us-east-1a", "us-east-1f"])
+
+# Shared configuration for our EC2 clients: retry throttled calls more often than
+# the default and don't let a stuck connection block a price update indefinitely.
+CLIENT_CONFIG = botocore.config.Config(retries={'max_attempts': 10}, connect_timeout=5, read_timeout=30)
+
+# EC2 clients created by this process, by (region, access key)
+_clients = {}
+
+
+def _get_client(region_name, aws_key_id, aws_secret_key):
+    '''Gets an EC2 client for the specified region, reusing the client (and its connections) if possible'''
+    key = (region_name, aws_key_id)
+    cli = _clients.get(key)
+    if cli is None:
+        # boto3 sessions must not be shared between threads, but the clients created
+        # from them can be, so only the clients are kept around.
+        session = boto3.session.Session(aws_access_key_id=aws_key_id, aws_secret_access_key=aws_secret_key)
+        cli = session.client('ec2', region_name=region_name, config=CLIENT_CONFIG)
+        _clients[key] = cli
+    return cli
 
 
-# This function must be defined at the module level so it can be pickled
-# by the multiprocessing module when calling this asynchronously.
 def get_spot_price_per_region(region_name, aws_key_id, aws_secret_key, instance_types=None):
     '''Gets spot prices of the specified region and instance type'''
-    prices = {}  # {instance-type: region: {az: [prices]}}}
+    zone_prices = defaultdict(list)  # {(instance-type, az): [prices]}
 
     now = timezone.now()
 
@@ -38,59 +60,50 @@ def get_spot_price_per_region(region_name, aws_key_id, aws_secret_key, instance_
         'StartTime': now - datetime.timedelta(hours=6)
     }
     if instance_types is not None:
-        spot_history_args['InstanceTypes'] = instance_types
+        spot_history_args['InstanceTypes'] = list(instance_types)
 
-    cli = boto3.client('ec2', region_name=region_name, aws_access_key_id=aws_key_id,
-                       aws_secret_access_key=aws_secret_key)
+    cli = _get_client(region_name, aws_key_id, aws_secret_key)
     paginator = cli.get_paginator('describe_spot_price_history')
     try:
-        for result in paginator.paginate(**spot_history_args):
+        # 1000 is the largest page size the API accepts, keeping the number of requests down
+        for result in paginator.paginate(PaginationConfig={'PageSize': 1000}, **spot_history_args):
             for price in result['SpotPriceHistory']:
-                if price['AvailabilityZone'] in zone_blacklist:
+                zone = price['AvailabilityZone']
+                if zone in zone_blacklist:
                     continue
-                (prices
-                 .setdefault(price['InstanceType'], {})
-                 .setdefault(region_name, {})
-                 .setdefault(price['AvailabilityZone'], [])
-                 .append(float(price['SpotPrice'])))
+                zone_prices[(price['InstanceType'], zone)].append(float(price['SpotPrice']))
     except botocore.exceptions.EndpointConnectionError as exc:
         raise RuntimeError("Boto connection error: %s" % (exc,))
 
+    prices = {}  # {instance-type: region: {az: [prices]}}}
+    for (instance_type, zone), zone_price_list in zone_prices.items():
+        prices.setdefault(instance_type, {region_name: {}})[region_name][zone] = zone_price_list
+
     return prices
 
 
-def get_spot_prices(regions, aws_key_id, aws_secret_key, instance_types=None, use_multiprocess=False):
-    if use_multiprocess:
-        from multiprocessing import Pool, cpu_count
-        pool = Pool(cpu_count())
+def get_spot_prices(regions, aws_key_id, aws_secret_key, instance_types=None, max_workers=16):
+    '''Gets spot prices of the specified regions, querying up to max_workers regions concurrently'''
+    def get_region_prices(region):
+        return get_spot_price_per_region(region, aws_key_id, aws_secret_key, instance_types)
 
-    try:
-        results = []
-        for region in regions:
-            args = [region, aws_key_id, aws_secret_key, instance_types]
-            if use_multiprocess:
-                results.append(pool.apply_async(get_spot_price_per_region, args))
-            else:
-                results.append(get_spot_price_per_region(*args))
-
-        prices = {}
-        for result in results:
-            if use_multiprocess:
-                result = result.get()
-            for instance_type in result:
-                prices.setdefault(instance_type, {})
-                prices[instance_type].update(result[instance_type])
-    finally:
-        if use_multiprocess:
-            pool.close()
-            pool.join()
+    regions = list(regions)
+    prices = {}
+    if not regions:
+        return prices
+
+    # These are plain HTTPS requests, so threads are sufficient to run them in parallel.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(regions))) as executor:
+        # Merge results as regions finish, so one slow region doesn't hold up the others.
+        # Every region only adds its own key below each instance type, so the order doesn't matter.
+        futures = [executor.submit(get_region_prices, region) for region in regions]
+        for future in as_completed(futures):
+            result = future.result()
+            for (instance_type, region_prices) in result.items():
+                prices.setdefault(instance_type, {}).update(region_prices)
 
     return prices
 
 
 def get_price_median(data):
-    sdata = sorted(data)
-    n = len(sdata)
-    if not n % 2:
-        return (sdata[n // 2] + sdata[n // 2 - 1]) / 2.0
-    return sdata[n // 2]
+    return float(numpy.median(data))
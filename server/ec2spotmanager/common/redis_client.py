@@ -0,0 +1,60 @@
+# encoding: utf-8
+'''
+Redis Client -- Shared access to the redis instance used by EC2SpotManager
+
+@license:
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+import logging
+
+from django.conf import settings
+import redis
+from redis.exceptions import LockError
+
+
+logger = logging.getLogger("ec2spotmanager")
+
+
+# Connection pool shared by all clients of this process (see get_redis)
+_pool = None
+
+# Seconds to wait for a free connection if REDIS_MAX_CONNECTIONS is reached
+REDIS_POOL_TIMEOUT = 20
+
+
+def get_redis():
+    '''Gets a redis client that reuses the connections of this process instead of opening new ones'''
+    global _pool
+    if _pool is None:
+        max_connections = getattr(settings, 'REDIS_MAX_CONNECTIONS', None)
+        if max_connections is None:
+            _pool = redis.ConnectionPool(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+        else:
+            # A plain ConnectionPool raises once the limit is reached, this one waits for a free connection
+            _pool = redis.BlockingConnectionPool(host=settings.REDIS_HOST, port=settings.REDIS_PORT,
+                                                 db=settings.REDIS_DB, max_connections=max_connections,
+                                                 timeout=REDIS_POOL_TIMEOUT)
+    return redis.StrictRedis(connection_pool=_pool)
+
+
+# Pool locks expire after this many seconds (unless overridden by the POOL_LOCK_TIMEOUT setting),
+# so a crashed worker cannot block a pool forever
+POOL_LOCK_TIMEOUT = 15 * 60
+
+
+def get_pool_lock(pool_id):
+    '''Gets the lock that serializes changes to the given pool, across all worker hosts'''
+    timeout = getattr(settings, 'POOL_LOCK_TIMEOUT', POOL_LOCK_TIMEOUT)
+    return get_redis().lock('ec2spot:lock:pool:%s' % pool_id, timeout=timeout)
+
+
+def release_pool_lock(lock):
+    '''Releases a lock from get_pool_lock, which may have expired while it was held'''
+    try:
+        lock.release()
+    except LockError:
+        # Raising here would hide the outcome of whatever ran under the lock.
+        logger.warning("Lock %s expired before it was released, consider raising POOL_LOCK_TIMEOUT.", lock.name)
@@ -1,12 +1,17 @@
 import datetime
 import json
 
-import redis
 from django.conf import settings
 from django.db.models.query_utils import Q
 from django.utils import timezone
 
 from celeryconf import app
+from .common.redis_client import get_redis
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 STATS_DELTA_SECS = 60 * 15  # 30 minutes
@@ -118,22 +123,32 @@ def update_spot_prices():
     from .models import PoolConfiguration
 
     regions = set()
+    instance_types = set()
     for cfg in PoolConfiguration.objects.all():
-        if cfg.ec2_allowed_regions:
-            regions |= set(json.loads(cfg.ec2_allowed_regions))
+        # the raw fields may carry an override marker, so let the model decode them
+        cfg.deserializeFields()
+        if cfg.ec2_allowed_regions_list:
+            regions |= set(cfg.ec2_allowed_regions_list)
+        if cfg.ec2_instance_types_list:
+            instance_types |= set(cfg.ec2_instance_types_list)
 
     now = timezone.now()
     expires = now + datetime.timedelta(hours=3)  # how long this data is valid (if not replaced)
 
     prices = get_spot_prices(regions,
                              getattr(settings, 'AWS_ACCESS_KEY_ID', None),
-                             getattr(settings, 'AWS_SECRET_ACCESS_KEY', None))
+                             getattr(settings, 'AWS_SECRET_ACCESS_KEY', None),
+                             # only fetch the instance types that some configuration can actually use
+                             instance_types=sorted(instance_types) or None)
 
     # use pipeline() so everything is in 1 transaction
-    cache = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB).pipeline()
-    for instance_type in prices:
+    cache = get_redis().pipeline()
+    for (instance_type, instance_type_prices) in prices.items():
         key = 'ec2spot:price:' + instance_type
         cache.delete(key)
-        cache.set(key, json.dumps(prices[instance_type], separators=(',', ':')))
+        if orjson is not None:
+            cache.set(key, orjson.dumps(instance_type_prices))
+        else:
+            cache.set(key, json.dumps(instance_type_prices, separators=(',', ':')))
         cache.expireat(key, expires)
     cache.execute()  # commit to redis
@@ -19,11 +19,25 @@ class FlatObject(dict):
 
 INSTANCE_STATE_CODE = {-1: "requested", 0: "pending", 16: "running", 32: "shutting-down", 48: "terminated",
                        64: "stopping", 80: "stopped"}
-INSTANCE_STATE = dict((val, key) for key, val in INSTANCE_STATE_CODE.items())
+INSTANCE_STATE = {"requested": -1, "pending": 0, "running": 16, "shutting-down": 32, "terminated": 48,
+                  "stopping": 64, "stopped": 80}
+
+# Status codes are a small, bounded set of integers, so names can be looked up
+# by indexing a table with (code + 1) instead of hashing into a dict.
+INSTANCE_STATE_NAMES = tuple(INSTANCE_STATE_CODE.get(code) for code in range(-1, max(INSTANCE_STATE_CODE) + 1))
+
+
+def get_instance_state_name(status_code):
+    """Return the name of the given instance status code, or None if the code is unknown."""
+    if -1 <= status_code < len(INSTANCE_STATE_NAMES) - 1:
+        return INSTANCE_STATE_NAMES[status_code + 1]
+    return None
+
 
 POOL_STATUS_ENTRY_TYPE_CODE = {0: "unclassified", 1: "price-too-low", 2: "config-error",
                                3: "max-spot-instance-count-exceeded", 4: "temporary-failure"}
-POOL_STATUS_ENTRY_TYPE = dict((val, key) for key, val in POOL_STATUS_ENTRY_TYPE_CODE.items())
+POOL_STATUS_ENTRY_TYPE = {"unclassified": 0, "price-too-low": 1, "config-error": 2,
+                          "max-spot-instance-count-exceeded": 3, "temporary-failure": 4}
 
 
 class OverwritingStorage(FileSystemStorage):
@@ -2,12 +2,15 @@ import json
 import logging
 import socket
 import ssl
+import time
 import traceback
 import boto.ec2
 import boto.exception
-import fasteners
-import redis
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import numpy
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from laniakea.core.providers.ec2 import EC2Manager
 from laniakea.core.userdata import UserData
@@ -15,19 +18,46 @@ from celeryconf import app
 from . import cron  # noqa ensure cron tasks get registered
 from .common.ec2 import CORES_PER_INSTANCE
 from .common.prices import get_price_median
+from .common.redis_client import get_pool_lock, get_redis, release_pool_lock
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 logger = logging.getLogger("ec2spotmanager")
 
 
 SPOTMGR_TAG = "SpotManager"
+SPOTMGR_TAG_POOL_ID = SPOTMGR_TAG + "-PoolId"
+SPOTMGR_TAG_UPDATABLE = SPOTMGR_TAG + "-Updatable"
+
+AMI_CACHE_LOCAL_SECS = 60 * 60  # How long resolved AMI IDs are kept in process memory
+
+# AMI IDs resolved in this process, as {(region, image name): (AMI ID, expiry timestamp)}
+_ami_cache = {}
+
+# States of spot requests that will not be fulfilled anymore, or may still be fulfilled
+SPOT_REQUEST_CLOSED_STATES = frozenset(["cancelled", "closed"])
+SPOT_REQUEST_OPEN_STATES = frozenset(["open", "active"])
+
+# Status entry types reported for the EC2 error codes we know how to handle (see _get_boto_error_type)
+BOTO_ERROR_CODE_TYPES = {
+    "MaxSpotInstanceCountExceeded": 'max-spot-instance-count-exceeded',
+    "ServiceUnavailable": 'temporary-failure',
+    "Unavailable": 'temporary-failure',
+}
+
+# EC2Manager instances connected by this process, by region (see _get_cluster)
+_clusters = {}
 
 
 @app.task
 def check_instance_pool(pool_id):
     from .models import Instance, InstancePool, INSTANCE_STATE, PoolStatusEntry, POOL_STATUS_ENTRY_TYPE
 
-    lock = fasteners.InterProcessLock('/tmp/ec2spotmanager.pool%d.lck' % pool_id)
+    lock = get_pool_lock(pool_id)
 
     if not lock.acquire(blocking=False):
         logger.warning('[Pool %d] Another check still in progress, exiting.', pool_id)
@@ -35,11 +65,11 @@ def check_instance_pool(pool_id):
 
     try:
 
-        instance_pool = InstancePool.objects.get(pk=pool_id)
+        instance_pool = InstancePool.objects.select_related('config').get(pk=pool_id)
 
         criticalPoolStatusEntries = PoolStatusEntry.objects.filter(pool=instance_pool, isCritical=True)
 
-        if criticalPoolStatusEntries:
+        if criticalPoolStatusEntries.exists():
             return
 
         if instance_pool.config.isCyclic() or instance_pool.config.getMissingParameters():
@@ -55,10 +85,13 @@ def check_instance_pool(pool_id):
 
         instance_cores_missing = config.size
         running_instances = []
+        terminated_instance_pks = []
 
         _update_pool_instances(instance_pool, config)
 
-        instances = Instance.objects.filter(pool=instance_pool)
+        # only load what is needed to classify, start and terminate instances
+        instances = Instance.objects.filter(pool=instance_pool).only(
+            'created', 'status_code', 'ec2_instance_id', 'ec2_region', 'size')
 
         for instance in instances:
             instance_status_code_fixed = False
@@ -76,7 +109,7 @@ def check_instance_pool(pool_id):
                 # The instance is no longer running, delete it from our database
                 logger.info("[Pool %d] Deleting terminated instance with EC2 ID %s from our database.",
                             instance_pool.id, instance.ec2_instance_id)
-                instance.delete()
+                terminated_instance_pks.append(instance.pk)
             else:
                 if instance_status_code_fixed:
                     # Restore original status code for error reporting
@@ -92,6 +125,9 @@ def check_instance_pool(pool_id):
                 instance_cores_missing -= instance.size
                 running_instances.append(instance)
 
+        if terminated_instance_pks:
+            Instance.objects.filter(pk__in=terminated_instance_pks).delete()
+
         # Continue working with the instances we have running
         instances = running_instances
 
@@ -118,7 +154,7 @@ def check_instance_pool(pool_id):
             # Select the oldest instances we have running and terminate
             # them so we meet the size limitation again.
             instances = []
-            for instance in Instance.objects.filter(pool=instance_pool).order_by('created'):
+            for instance in sorted(running_instances, key=lambda instance: instance.created):
                 if instance_cores_missing + instance.size > 0:
                     # If this instance would leave us short of cores, let it run. Otherwise
                     # the pool size may oscillate.
@@ -136,54 +172,70 @@ def check_instance_pool(pool_id):
             logger.debug("[Pool %d] Size is ok.", instance_pool.id)
 
     finally:
-        lock.release()
+        release_pool_lock(lock)
 
 
 def _get_best_region_zone(config):
-    cache = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+    cache = get_redis()
 
-    # Calculate median values for all availability zones and best zone/price
-    best_zone = None
-    best_region = None
-    best_type = None
-    best_median = None
-    rejected_prices = {}
+    instance_types = list(config.ec2_instance_types)
     allowed_regions = set(config.ec2_allowed_regions)  # cache this as a set to make membership test faster in the loop
-    for instance_type in config.ec2_instance_types:
-        data = cache.get("ec2spot:price:" + instance_type)
+
+    # Fetch the price data of all instance types in one round trip
+    price_data = cache.mget(["ec2spot:price:" + instance_type for instance_type in instance_types]) \
+        if instance_types else []
+
+    zone_prices = []  # (region, zone, instance_type, 1 / cores, [prices]) for all zones in allowed regions
+    for (instance_type, data) in zip(instance_types, price_data):
         if data is None:
             logger.warning("No price data for %s?", instance_type)
             continue
-        data = json.loads(data)
-        for region in data:
+        # the price data of an instance type covers every zone, which orjson parses considerably faster
+        data = orjson.loads(data) if orjson is not None else json.loads(data)
+        inv_cores = 1.0 / CORES_PER_INSTANCE[instance_type]
+        for (region, region_data) in data.items():
             if region not in allowed_regions:
                 continue
-            for zone in data[region]:
-                # look for blacklisted zone/type
-                # zone+type is blacklisted because a previous spot request timed-out
-                if cache.get("ec2spot:blacklist:%s:%s" % (zone, instance_type)) is not None:
-                    logger.debug("%s/%s is blacklisted", zone, instance_type)
-                    continue
+            for (zone, zone_price_list) in region_data.items():
+                zone_prices.append((region, zone, instance_type, inv_cores, zone_price_list))
 
-                # calculate price per core
-                prices = [price / CORES_PER_INSTANCE[instance_type] for price in data[region][zone]]
+    # look for blacklisted zone/type, again in one round trip
+    # zone+type is blacklisted because a previous spot request timed-out
+    blacklisted = cache.mget(["ec2spot:blacklist:%s:%s" % (zone, instance_type)
+                              for (_, zone, instance_type, _, _) in zone_prices]) if zone_prices else []
 
-                # Do not consider a zone/region combination that has a current
-                # price higher than the maximum price we are willing to pay,
-                # even if the median would end up being lower than our maximum.
-                if prices[0] > config.ec2_max_price:
-                    rejected_prices[zone] = min(rejected_prices.get(zone, 9999),
-                                                prices[0])
-                    continue
+    # Calculate median values for all availability zones and best zone/price
+    max_price = config.ec2_max_price
+    candidates = []  # (region, zone, instance_type) for every zone that is cheap enough
+    candidate_medians = []  # median price per core for each entry in candidates
+    rejected_prices = {}
+    for ((region, zone, instance_type, inv_cores, zone_price_list), blacklist_entry) in zip(zone_prices, blacklisted):
+        if blacklist_entry is not None:
+            logger.debug("%s/%s is blacklisted", zone, instance_type)
+            continue
+
+        # calculate price per core
+        prices = numpy.array(zone_price_list) * inv_cores
+
+        # Do not consider a zone/region combination that has a current
+        # price higher than the maximum price we are willing to pay,
+        # even if the median would end up being lower than our maximum.
+        if prices[0] > max_price:
+            rejected_prices[zone] = min(rejected_prices.get(zone, float('inf')),
+                                        float(prices[0]))
+            continue
+
+        candidates.append((region, zone, instance_type))
+        candidate_medians.append(get_price_median(prices))
+
+    if not candidates:
+        return (None, None, None, rejected_prices)
 
-                median = get_price_median(prices)
-                if best_median is None or best_median > median:
-                    best_median = median
-                    best_zone = zone
-                    best_region = region
-                    best_type = instance_type
-                    logger.debug("Best price median currently %r in %s/%s (%s)",
-                                 median, best_region, best_zone, best_type)
+    # Select the cheapest candidate in one vectorized pass
+    best = numpy.argmin(candidate_medians)
+    (best_region, best_zone, best_type) = candidates[best]
+    logger.info("Best price median is %r in %s/%s (%s)",
+                candidate_medians[best], best_region, best_zone, best_type)
 
     return (best_region, best_zone, best_type, rejected_prices)
 
@@ -209,28 +261,78 @@ def _create_laniakea_images(config):
     return images
 
 
+def _get_boto_error_type(error):
+    """Return the name of the PoolStatusEntry type to report for the given boto error.
+
+    The error code and HTTP status parsed by boto are used rather than the error
+    message, which is subject to change. None is returned for unknown errors
+    (including connection errors, which carry no error code).
+    """
+    error_type = BOTO_ERROR_CODE_TYPES.get(getattr(error, 'error_code', None))
+    if error_type is None and getattr(error, 'status', None) == 503:
+        error_type = 'temporary-failure'
+    return error_type
+
+
+def _get_cluster(region):
+    """Return an EC2Manager connected to the given region.
+
+    Connections are kept for the lifetime of the process, so that repeated pool
+    checks reuse them instead of setting up a new connection for every call.
+    """
+    cluster = _clusters.get(region)
+    if cluster is None:
+        cluster = EC2Manager(None)
+        cluster.connect(region=region, aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+        _clusters[region] = cluster
+    return cluster
+
+
+def _resolve_image(cache, cluster, region, image_name):
+    """Resolve an image name to an AMI ID in the given region.
+
+    AMI IDs only change when an image is republished, so results are kept in this
+    process for AMI_CACHE_LOCAL_SECS and shared with other workers through redis
+    for a day, to avoid repeating the (slow) lookup on EC2.
+    """
+    now = time.time()
+    cached = _ami_cache.get((region, image_name))
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    # look for cached AMI by name in this region
+    ami_cache_key = "ec2spot:ami:%s:%s" % (region, image_name)
+    ami = cache.get(ami_cache_key)
+    if ami is None:
+        ami = cluster.resolve_image_name(image_name)
+        cache.set(ami_cache_key, ami, ex=24 * 3600)
+    elif not isinstance(ami, str):
+        # redis returns bytes on Python 3, but boto expects the ID as a string like the one we stored
+        ami = ami.decode("utf-8")
+
+    _ami_cache[(region, image_name)] = (ami, now + AMI_CACHE_LOCAL_SECS)
+    return ami
+
+
 def _start_pool_instances(pool, config, count=1):
     """ Start an instance with the given configuration """
     from .models import Instance, INSTANCE_STATE, PoolStatusEntry, POOL_STATUS_ENTRY_TYPE
 
-    cache = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+    cache = get_redis()
 
     images = _create_laniakea_images(config)
 
     # Filter machine sizes that would put us over the number of cores required. If all do, then choose the smallest.
+    instance_sizes = [(instance_type, CORES_PER_INSTANCE[instance_type])
+                      for instance_type in config.ec2_instance_types]
+    acceptable_types = [instance_type for (instance_type, instance_size) in instance_sizes if instance_size <= count]
     smallest = []
-    smallest_size = None
-    acceptable_types = []
-    for instance_type in list(config.ec2_instance_types):
-        instance_size = CORES_PER_INSTANCE[instance_type]
-        if instance_size <= count:
-            acceptable_types.append(instance_type)
+    if instance_sizes:
         # keep track of all instance types with the least number of cores for this config
-        if not smallest or instance_size < smallest_size:
-            smallest_size = instance_size
-            smallest = [instance_type]
-        elif instance_size == smallest_size:
-            smallest.append(instance_type)
+        smallest_size = min(instance_size for (_, instance_size) in instance_sizes)
+        smallest = [instance_type for (instance_type, instance_size) in instance_sizes
+                    if instance_size == smallest_size]
     # replace the allowed instance types with those that are <= count, or the smallest if none are
     config.ec2_instance_types = acceptable_types or smallest
 
@@ -256,18 +358,18 @@ def _start_pool_instances(pool, config, count=1):
     if not region:
         logger.warning("[Pool %d] No allowed region was cheap enough to spawn instances.", pool.id)
 
-        if not priceLowEntries:
+        if not priceLowEntries.exists():
             entry = PoolStatusEntry()
             entry.pool = pool
             entry.type = POOL_STATUS_ENTRY_TYPE['price-too-low']
             entry.msg = "No allowed region was cheap enough to spawn instances."
-            for zone in rejected:
-                entry.msg += "\n%s at %s" % (zone, rejected[zone])
+            for (zone, rejected_price) in rejected.items():
+                entry.msg += "\n%s at %s" % (zone, rejected_price)
             entry.save()
         return
     else:
-        if priceLowEntries:
-            priceLowEntries.delete()
+        # a single DELETE, which is a no-op if there are no such entries
+        priceLowEntries.delete()
 
     # convert count from cores to instances
     #
@@ -314,19 +416,10 @@ def _start_pool_instances(pool, config, count=1):
         images["default"]['count'] = count
         images["default"]['instance_type'] = instance_type
 
-        cluster = EC2Manager(None)
         try:
-            cluster.connect(region=region, aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+            cluster = _get_cluster(region)
             # resolve AMI manually so we can cache it (marketplace lookups can be slow)
-            ami = None
-            # look for cached AMI by name in this region
-            ami_cache_key = "ec2spot:ami:%s:%s" % (region, images["default"]["image_name"])
-            ami = cache.get(ami_cache_key)
-            if ami is None:
-                ami = cluster.resolve_image_name(images["default"]["image_name"])
-                cache.set(ami_cache_key, ami, ex=24 * 3600)
-            images['default']['image_id'] = ami
+            images['default']['image_id'] = _resolve_image(cache, cluster, region, images["default"]["image_name"])
             images['default'].pop('image_name')
             cluster.images = images
         except ssl.SSLError as msg:
@@ -356,30 +449,31 @@ def _start_pool_instances(pool, config, count=1):
         try:
             logger.info("[Pool %d] Creating %dx %s instances... (%d cores total)", pool.id, count, instance_type,
                         count * CORES_PER_INSTANCE[instance_type])
-            for ec2_request in cluster.create_spot_requests(config.ec2_max_price * CORES_PER_INSTANCE[instance_type],
-                                                            delete_on_termination=True,
-                                                            timeout=10 * 60):
-                instance = Instance()
-                instance.ec2_instance_id = ec2_request
-                instance.ec2_region = region
-                instance.ec2_zone = zone
-                instance.status_code = INSTANCE_STATE["requested"]
-                instance.pool = pool
-                instance.size = CORES_PER_INSTANCE[instance_type]
-                instance.save()
+            ec2_requests = cluster.create_spot_requests(config.ec2_max_price * CORES_PER_INSTANCE[instance_type],
+                                                        delete_on_termination=True,
+                                                        timeout=10 * 60)
+            # Record all requests with a single INSERT
+            Instance.objects.bulk_create([Instance(ec2_instance_id=ec2_request,
+                                                   ec2_region=region,
+                                                   ec2_zone=zone,
+                                                   status_code=INSTANCE_STATE["requested"],
+                                                   pool=pool,
+                                                   size=CORES_PER_INSTANCE[instance_type])
+                                          for ec2_request in ec2_requests], batch_size=200)
 
         except (boto.exception.EC2ResponseError, boto.exception.BotoServerError, ssl.SSLError, socket.error) as msg:
-            if "MaxSpotInstanceCountExceeded" in str(msg):
+            error_type = _get_boto_error_type(msg)
+            if error_type == 'max-spot-instance-count-exceeded':
                 logger.warning("[Pool %d] start_pool_instances: Maximum instance count exceeded for region %s",
                                pool.id, region)
                 if not PoolStatusEntry.objects.filter(
-                        pool=pool, type=POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']):
+                        pool=pool, type=POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']).exists():
                     entry = PoolStatusEntry()
                     entry.pool = pool
                     entry.type = POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']
                     entry.msg = "Auto-selected region exceeded its maximum spot instance count."
                     entry.save()
-            elif "Service Unavailable" in str(msg):
+            elif error_type == 'temporary-failure':
                 logger.warning("[Pool %d] start_pool_instances: Temporary failure in region %s: %s",
                                pool.id, region, msg)
                 entry = PoolStatusEntry()
@@ -405,12 +499,11 @@ def _terminate_pool_instances(pool, instances, config, terminateByPool=False):
     """ Terminate an instance with the given configuration """
     from .models import INSTANCE_STATE, PoolStatusEntry, POOL_STATUS_ENTRY_TYPE
     instance_ids_by_region = _get_instance_ids_by_region(instances)
+    terminated_states = frozenset([INSTANCE_STATE['shutting-down'], INSTANCE_STATE['terminated']])
 
-    for region in instance_ids_by_region:
-        cluster = EC2Manager(None)
+    for (region, instance_ids) in instance_ids_by_region.items():
         try:
-            cluster.connect(region=region, aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+            cluster = _get_cluster(region)
         except Exception as msg:
             # Log this error to the pool status messages
             entry = PoolStatusEntry()
@@ -425,16 +518,15 @@ def _terminate_pool_instances(pool, instances, config, terminateByPool=False):
 
         try:
             if terminateByPool:
-                boto_instances = cluster.find(filters={"tag:" + SPOTMGR_TAG + "-PoolId": str(pool.pk)})
+                boto_instances = cluster.find(filters={"tag:" + SPOTMGR_TAG_POOL_ID: str(pool.pk)})
 
                 # Data consistency checks
+                region_instance_ids = set(instance_ids)
                 for boto_instance in boto_instances:
                     # state_code is a 16-bit value where the high byte is
                     # an opaque internal value and should be ignored.
                     state_code = boto_instance.state_code & 255
-                    if not ((boto_instance.id in instance_ids_by_region[region]) or
-                            (state_code == INSTANCE_STATE['shutting-down'] or
-                             state_code == INSTANCE_STATE['terminated'])):
+                    if boto_instance.id not in region_instance_ids and state_code not in terminated_states:
                         logger.error("[Pool %d] Instance with EC2 ID %s (status %d) "
                                      "is not in region list for region %s",
                                      pool.id, boto_instance.id, state_code, region)
@@ -442,41 +534,56 @@ def _terminate_pool_instances(pool, instances, config, terminateByPool=False):
                 cluster.terminate(boto_instances)
             else:
                 logger.info("[Pool %d] Terminating %s instances in region %s",
-                            pool.id, len(instance_ids_by_region[region]), region)
-                cluster.terminate(cluster.find(instance_ids=instance_ids_by_region[region]))
+                            pool.id, len(instance_ids), region)
+                # We already know the instance IDs, so there is no need to look them up before terminating
+                cluster.ec2.terminate_instances(instance_ids)
         except (boto.exception.EC2ResponseError, boto.exception.BotoServerError, ssl.SSLError, socket.error) as msg:
             logger.exception("[Pool %d] terminate_pool_instances: boto failure: %s", pool.id, msg)
             return 1
 
 
 def _get_instance_ids_by_region(instances):
-    instance_ids_by_region = {}
-
+    instance_ids_by_region = defaultdict(list)
     for instance in instances:
-        if instance.ec2_region not in instance_ids_by_region:
-            instance_ids_by_region[instance.ec2_region] = []
         instance_ids_by_region[instance.ec2_region].append(instance.ec2_instance_id)
-
-    return instance_ids_by_region
+    return dict(instance_ids_by_region)
 
 
-def _get_instances_by_ids(instances):
+def _index_instances(instances):
+    """Index the given instances by region (instance IDs) and by instance ID, in a single pass"""
+    instance_ids_by_region = defaultdict(list)
     instances_by_ids = {}
     for instance in instances:
+        instance_ids_by_region[instance.ec2_region].append(instance.ec2_instance_id)
         instances_by_ids[instance.ec2_instance_id] = instance
-    return instances_by_ids
+    return (dict(instance_ids_by_region), instances_by_ids)
+
+
+def _query_region_instances(pool, cluster, requested, tags):
+    """Query EC2 for the state of the given spot requests, or of the pool instances in the cluster's region.
+
+    Returns a tuple of the spot request results and the pool instances. If there are spot
+    requests, the instances are not queried (None), because fulfilled requests must first
+    be saved and tagged before the pool instances can be looked up.
+    """
+    if requested:
+        return (cluster.check_spot_requests(requested, tags), None)
+    return (None, cluster.find(filters={"tag:" + SPOTMGR_TAG_POOL_ID: str(pool.pk)}))
 
 
 def _update_pool_instances(pool, config):
     """Check the state of the instances in a pool and update it in the database"""
     from .models import Instance, INSTANCE_STATE, PoolStatusEntry, POOL_STATUS_ENTRY_TYPE
 
-    cache = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
-
     instances = Instance.objects.filter(pool=pool)
-    instance_ids_by_region = _get_instance_ids_by_region(instances)
-    instances_by_ids = _get_instances_by_ids(instances)
-    instances_left = []
+    (instance_ids_by_region, instances_by_ids) = _index_instances(instances)
+    if not instance_ids_by_region:
+        # nothing to update, so don't bother connecting to redis or EC2
+        return
+
+    cache = get_redis()
+
+    instances_left = set()
     instances_created = False
 
     debug_boto_instance_ids_seen = set()
@@ -485,16 +592,23 @@ def _update_pool_instances(pool, config):
 
     for instance in instances_by_ids.values():
         if instance.status_code != INSTANCE_STATE['requested']:
-            instances_left.append(instance)
+            instances_left.add(instance)
 
     # set config to this pool for now in case we set tags on fulfilled spot requests
-    config.ec2_tags[SPOTMGR_TAG + '-PoolId'] = str(pool.pk)
+    config.ec2_tags[SPOTMGR_TAG_POOL_ID] = str(pool.pk)
+
+    # pending spot requests, by region
+    requested_by_region = {}
+    for (region, instance_ids) in instance_ids_by_region.items():
+        requested_by_region[region] = [instance_id for instance_id in instance_ids
+                                       if instances_by_ids[instance_id].status_code == INSTANCE_STATE['requested']]
 
+    # Connect to all regions up front, in this thread. The connections are shared with later
+    # pool checks and must not be set up concurrently by the query threads below.
+    clusters = {}
     for region in instance_ids_by_region:
-        cluster = EC2Manager(None)
         try:
-            cluster.connect(region=region, aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY)
+            clusters[region] = _get_cluster(region)
         except Exception as msg:
             # Log this error to the pool status messages
             entry = PoolStatusEntry()
@@ -507,201 +621,257 @@ def _update_pool_instances(pool, config):
             logger.exception("[Pool %d] update_pool_instances: laniakea failure: %s", pool.id, msg)
             return
 
-        try:
-            # first check status of pending spot requests
-            requested = []
-            for instance_id in instance_ids_by_region[region]:
-                if instances_by_ids[instance_id].status_code == INSTANCE_STATE['requested']:
-                    requested.append(instance_id)
-
-            if requested:
-                boto_results = cluster.check_spot_requests(requested, config.ec2_tags)
-
-                for req_id, result in zip(requested, boto_results):
-                    instance = instances_by_ids[req_id]
-
-                    if isinstance(result, boto.ec2.instance.Instance):
-                        logger.info("[Pool %d] spot request fulfilled %s -> %s", pool.id, req_id, result.id)
-
-                        # spot request has been fulfilled
-                        instance.hostname = result.public_dns_name
-                        instance.ec2_instance_id = result.id
-                        # state_code is a 16-bit value where the high byte is
-                        # an opaque internal value and should be ignored.
-                        instance.status_code = result.state_code & 255
-                        instance.save()
-
-                        # update local data structures to use the new instances instead
-                        del instances_by_ids[req_id]
-                        instances_by_ids[result.id] = instance
-                        instance_ids_by_region[region].append(result.id)
-                        # don't add it to instances_left yet to avoid race with adding tags
-
-                        # Now that we saved the object into our database, mark the instance as updatable
-                        # so our update code can pick it up and update it accordingly when it changes states
-                        result.add_tag(SPOTMGR_TAG + "-Updatable", "1")
-
-                        instances_created = True
-
-                    # request object is returned in case request is closed/cancelled/failed
-                    elif isinstance(result, boto.ec2.spotinstancerequest.SpotInstanceRequest):
-                        if result.state in {"cancelled", "closed"}:
-                            # request was not fulfilled for some reason.. blacklist this type/zone for a while
-                            logger.info("[Pool %d] spot request %s is %s", pool.id, req_id, result.state)
-                            inst = instances_by_ids[req_id]
-                            key = "ec2spot:blacklist:%s:%s" % (inst.ec2_zone, result.launch_specification.instance_type)
-                            cache.set(key, "", ex=12 * 3600)
-                            logger.warning("Blacklisted %s for 12h", key)
-                            inst.delete()
-
-                        elif result.state in {"open", "active"}:
-                            # this should not happen! warn and leave in DB in case it's fulfilled later
-                            logger.warning("[Pool %d] Request %s is %s and %s.",
-                                           pool.id,
-                                           req_id,
-                                           result.status.code,
-                                           result.state)
-                        else:  # state=failed
-                            msg = "Request %s is %s and %s." % (req_id, result.status.code, result.state)
-
-                            entry = PoolStatusEntry()
-                            entry.type = POOL_STATUS_ENTRY_TYPE['unclassified']
-                            entry.pool = pool
-                            entry.msg = str(msg)
-                            entry.isCritical = True
-                            entry.save()
-
-                            logger.error("[Pool %d] %s", pool.id, msg)
-                            instances_by_ids[req_id].delete()
-
-                    elif result is None:
-                        logger.info("[Pool %d] spot request %s is still open", pool.pk, req_id)
-
-                    else:
-                        logger.warning("[Pool %d] spot request %s returned %s", pool.pk, req_id, type(result).__name__)
-
-            boto_instances = cluster.find(filters={"tag:" + SPOTMGR_TAG + "-PoolId": str(pool.pk)})
-
-            for boto_instance in boto_instances:
-                # Store ID seen for debugging purposes
-                debug_boto_instance_ids_seen.add(boto_instance.id)
-
-                # state_code is a 16-bit value where the high byte is
-                # an opaque internal value and should be ignored.
-                state_code = boto_instance.state_code & 255
-
-                if (SPOTMGR_TAG + "-Updatable" not in boto_instance.tags or
-                        int(boto_instance.tags[SPOTMGR_TAG + "-Updatable"]) <= 0):
-                    # The instance is not marked as updatable. We must not touch it because
-                    # a spawning thread is still managing this instance. However, we must also
-                    # remove this instance from the instances_left list if it's already in our
-                    # database, because otherwise our code here would delete it from the database.
-                    if boto_instance.id in instance_ids_by_region[region]:
-                        instances_left.remove(instances_by_ids[boto_instance.id])
-                    else:
-                        debug_not_updatable_continue.add(boto_instance.id)
-                    continue
-
-                instance = None
-
-                # Whenever we see an instance that is not in our instance list for that region,
-                # make sure it's a terminated instance because we should never have a running
-                # instance that matches the search above but is not in our database.
-                if boto_instance.id not in instance_ids_by_region[region]:
-                    if state_code not in [INSTANCE_STATE['shutting-down'], INSTANCE_STATE['terminated']]:
-
-                        # As a last resort, try to find the instance in our database.
-                        # If the instance was saved to our database between the entrance
-                        # to this function and the search query sent to EC2, then the instance
-                        # will not be in our instances list but returned by EC2. In this
-                        # case, we try to load it directly from the database.
-                        q = Instance.objects.filter(ec2_instance_id=boto_instance.id)
-                        if q:
-                            instance = q[0]
-                            logger.error("[Pool %d] Instance with EC2 ID %s was reloaded from database.",
-                                         pool.id, boto_instance.id)
-                        else:
-                            logger.error("[Pool %d] Instance with EC2 ID %s is not in our database.",
-                                         pool.id, boto_instance.id)
-
-                            # Terminate at this point, we run in an inconsistent state
-                            assert(False)
-                    debug_not_in_region[boto_instance.id] = state_code
-                    continue
+    # Query all regions in parallel, as these are independent EC2 round trips (each region has
+    # its own connection). The results are still processed one region at a time below, and
+    # leaving the with block waits for all queries, so no thread outlives this function.
+    with ThreadPoolExecutor(max_workers=len(instance_ids_by_region)) as executor:
+        region_queries = {}
+        for region in instance_ids_by_region:
+            region_queries[region] = executor.submit(_query_region_instances, pool, clusters[region],
+                                                     requested_by_region[region], config.ec2_tags)
+
+        for region in instance_ids_by_region:
+            cluster = clusters[region]
+
+            try:
+                # first check status of pending spot requests
+                requested = requested_by_region[region]
+                (boto_results, boto_instances) = region_queries[region].result()
+
+                if requested:
+                    # fulfilled requests, saved and then tagged as updatable after the loop
+                    fulfilled_instances = []
+                    updatable_ids = []
+                    # zone/type blacklist keys and primary keys of closed requests, written after the loop
+                    blacklist_keys = []
+                    closed_request_pks = []
+
+                    try:
+                        for req_id, result in zip(requested, boto_results):
+                            instance = instances_by_ids[req_id]
+
+                            if isinstance(result, boto.ec2.instance.Instance):
+                                logger.info("[Pool %d] spot request fulfilled %s -> %s", pool.id, req_id, result.id)
+
+                                # spot request has been fulfilled
+                                instance.hostname = result.public_dns_name
+                                instance.ec2_instance_id = result.id
+                                # state_code is a 16-bit value where the high byte is
+                                # an opaque internal value and should be ignored.
+                                instance.status_code = result.state_code & 255
+                                fulfilled_instances.append(instance)
+
+                                # update local data structures to use the new instances instead
+                                del instances_by_ids[req_id]
+                                instances_by_ids[result.id] = instance
+                                instance_ids_by_region[region].append(result.id)
+                                # don't add it to instances_left yet to avoid race with adding tags
+
+                                # Once all instances are saved into our database, they are marked as updatable
+                                # below, so our update code can pick them up and update them when they change states
+                                updatable_ids.append(result.id)
+
+                                instances_created = True
+
+                            # request object is returned in case request is closed/cancelled/failed
+                            elif isinstance(result, boto.ec2.spotinstancerequest.SpotInstanceRequest):
+                                if result.state in SPOT_REQUEST_CLOSED_STATES:
+                                    # request was not fulfilled for some reason.. blacklist this type/zone for a while
+                                    logger.info("[Pool %d] spot request %s is %s", pool.id, req_id, result.state)
+                                    inst = instances_by_ids[req_id]
+                                    key = "ec2spot:blacklist:%s:%s" % (inst.ec2_zone,
+                                                                       result.launch_specification.instance_type)
+                                    blacklist_keys.append(key)
+                                    logger.warning("Blacklisted %s for 12h", key)
+                                    closed_request_pks.append(inst.pk)
+
+                                elif result.state in SPOT_REQUEST_OPEN_STATES:
+                                    # this should not happen! warn and leave in DB in case it's fulfilled later
+                                    logger.warning("[Pool %d] Request %s is %s and %s.",
+                                                   pool.id,
+                                                   req_id,
+                                                   result.status.code,
+                                                   result.state)
+                                else:  # state=failed
+                                    msg = "Request %s is %s and %s." % (req_id, result.status.code, result.state)
+
+                                    entry = PoolStatusEntry()
+                                    entry.type = POOL_STATUS_ENTRY_TYPE['unclassified']
+                                    entry.pool = pool
+                                    entry.msg = str(msg)
+                                    entry.isCritical = True
+                                    entry.save()
+
+                                    logger.error("[Pool %d] %s", pool.id, msg)
+                                    closed_request_pks.append(instances_by_ids[req_id].pk)
+
+                            elif result is None:
+                                logger.info("[Pool %d] spot request %s is still open", pool.pk, req_id)
+
+                            else:
+                                logger.warning("[Pool %d] spot request %s returned %s",
+                                               pool.pk, req_id, type(result).__name__)
+
+                        # Write all blacklist entries in one round trip and drop all closed requests at once
+                        if blacklist_keys:
+                            pipe = cache.pipeline(transaction=False)
+                            for key in blacklist_keys:
+                                pipe.set(key, "", ex=12 * 3600)
+                            pipe.execute()
+                        if closed_request_pks:
+                            Instance.objects.filter(pk__in=closed_request_pks).delete()
+
+                    finally:
+                        # Every fulfilled instance has its own hostname and EC2 ID, so they can't be written
+                        # with a single UPDATE, but saving them in one transaction still avoids a commit per row.
+                        if fulfilled_instances:
+                            with transaction.atomic():
+                                for instance in fulfilled_instances:
+                                    instance.save()
+
+                        # Tag all fulfilled instances at once (EC2 accepts up to 1000 resources per call).
+                        # This must also happen if we fail halfway, or saved instances would never become updatable.
+                        for idx in range(0, len(updatable_ids), 1000):
+                            cluster.retry_on_ec2_error(cluster.ec2.create_tags, updatable_ids[idx:idx + 1000],
+                                                       {SPOTMGR_TAG_UPDATABLE: "1"})
+
+                if boto_instances is None:
+                    boto_instances = cluster.find(filters={"tag:" + SPOTMGR_TAG_POOL_ID: str(pool.pk)})
+
+                # Primary keys of instances whose status code changed, by new status code
+                status_updates = {}
 
-                instance = instances_by_ids[boto_instance.id]
-                if instance in instances_left:
-                    instances_left.remove(instance)
+                for boto_instance in boto_instances:
+                    # Store ID seen for debugging purposes
+                    debug_boto_instance_ids_seen.add(boto_instance.id)
 
-                # Check the status code and update if necessary
-                if instance.status_code != state_code:
-                    instance.status_code = state_code
-                    instance.save()
+                    # state_code is a 16-bit value where the high byte is
+                    # an opaque internal value and should be ignored.
+                    state_code = boto_instance.state_code & 255
 
-                # If for some reason we don't have a hostname yet,
-                # update it accordingly.
-                if not instance.hostname:
-                    instance.hostname = boto_instance.public_dns_name
-                    instance.save()
+                    if int(boto_instance.tags.get(SPOTMGR_TAG_UPDATABLE, 0)) <= 0:
+                        # The instance is not marked as updatable. We must not touch it because
+                        # a spawning thread is still managing this instance. However, we must also
+                        # remove this instance from the instances_left set if it's already in our
+                        # database, because otherwise our code here would delete it from the database.
+                        if boto_instance.id in instance_ids_by_region[region]:
+                            instances_left.discard(instances_by_ids[boto_instance.id])
+                        else:
+                            debug_not_updatable_continue.add(boto_instance.id)
+                        continue
+
+                    instance = None
+
+                    # Whenever we see an instance that is not in our instance list for that region,
+                    # make sure it's a terminated instance because we should never have a running
+                    # instance that matches the search above but is not in our database.
+                    if boto_instance.id not in instance_ids_by_region[region]:
+                        if state_code not in [INSTANCE_STATE['shutting-down'], INSTANCE_STATE['terminated']]:
+
+                            # As a last resort, try to find the instance in our database.
+                            # If the instance was saved to our database between the entrance
+                            # to this function and the search query sent to EC2, then the instance
+                            # will not be in our instances list but returned by EC2. In this
+                            # case, we try to load it directly from the database.
+                            if Instance.objects.filter(ec2_instance_id=boto_instance.id).exists():
+                                logger.error("[Pool %d] Instance with EC2 ID %s was reloaded from database.",
+                                             pool.id, boto_instance.id)
+                            else:
+                                msg = "Instance with EC2 ID %s is not in our database." % boto_instance.id
+                                logger.error("[Pool %d] %s", pool.id, msg)
+
+                                # Stop updating at this point, we run in an inconsistent state. The entry
+                                # is not critical, so the pool is checked again on the next run.
+                                entry = PoolStatusEntry()
+                                entry.type = POOL_STATUS_ENTRY_TYPE['unclassified']
+                                entry.pool = pool
+                                entry.msg = msg
+                                entry.save()
+                                return
+                        debug_not_in_region[boto_instance.id] = state_code
+                        continue
+
+                    instance = instances_by_ids[boto_instance.id]
+                    instances_left.discard(instance)
+
+                    # Check the status code and update if necessary (written to the database below)
+                    if instance.status_code != state_code:
+                        instance.status_code = state_code
+                        status_updates.setdefault(state_code, []).append(instance.pk)
+
+                    # If for some reason we don't have a hostname yet,
+                    # update it accordingly.
+                    if not instance.hostname:
+                        instance.hostname = boto_instance.public_dns_name
+                        instance.save()
 
-        except (boto.exception.EC2ResponseError, boto.exception.BotoServerError, ssl.SSLError, socket.error) as msg:
-            if "MaxSpotInstanceCountExceeded" in str(msg):
-                logger.warning("[Pool %d] update_pool_instances: Maximum instance count exceeded for region %s",
-                               pool.id, region)
-                if not PoolStatusEntry.objects.filter(
-                        pool=pool, type=POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']):
+                # Update the status codes with one query per status code, rather than one per instance
+                for (state_code, instance_pks) in status_updates.items():
+                    Instance.objects.filter(pk__in=instance_pks).update(status_code=state_code)
+
+            except (boto.exception.EC2ResponseError, boto.exception.BotoServerError, ssl.SSLError, socket.error) as msg:
+                error_type = _get_boto_error_type(msg)
+                if error_type == 'max-spot-instance-count-exceeded':
+                    logger.warning("[Pool %d] update_pool_instances: Maximum instance count exceeded for region %s",
+                                   pool.id, region)
+                    if not PoolStatusEntry.objects.filter(
+                            pool=pool, type=POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']).exists():
+                        entry = PoolStatusEntry()
+                        entry.pool = pool
+                        entry.type = POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']
+                        entry.msg = "Auto-selected region exceeded its maximum spot instance count."
+                        entry.save()
+                elif error_type == 'temporary-failure':
+                    logger.warning("[Pool %d] update_pool_instances: Temporary failure in region %s: %s",
+                                   pool.id, region, msg)
                     entry = PoolStatusEntry()
                     entry.pool = pool
-                    entry.type = POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']
-                    entry.msg = "Auto-selected region exceeded its maximum spot instance count."
+                    entry.type = POOL_STATUS_ENTRY_TYPE['temporary-failure']
+                    entry.msg = "Temporary failure occurred: %s" % msg
                     entry.save()
-            elif "Service Unavailable" in str(msg):
-                logger.warning("[Pool %d] update_pool_instances: Temporary failure in region %s: %s",
-                               pool.id, region, msg)
-                entry = PoolStatusEntry()
-                entry.pool = pool
-                entry.type = POOL_STATUS_ENTRY_TYPE['temporary-failure']
-                entry.msg = "Temporary failure occurred: %s" % msg
-                entry.save()
-            else:
-                logger.exception("[Pool %d] update_pool_instances: boto failure: %s", pool.id, msg)
-                entry = PoolStatusEntry()
-                entry.type = POOL_STATUS_ENTRY_TYPE['unclassified']
-                entry.pool = pool
-                entry.isCritical = True
-                entry.msg = "Unclassified error occurred: %s" % msg
-                entry.save()
-            return
+                else:
+                    logger.exception("[Pool %d] update_pool_instances: boto failure: %s", pool.id, msg)
+                    entry = PoolStatusEntry()
+                    entry.type = POOL_STATUS_ENTRY_TYPE['unclassified']
+                    entry.pool = pool
+                    entry.isCritical = True
+                    entry.msg = "Unclassified error occurred: %s" % msg
+                    entry.save()
+                return
 
+    deleted_instance_pks = []
     for instance in instances_left:
-        reasons = []
+        if logger.isEnabledFor(logging.INFO):
+            reasons = []
 
-        if instance.ec2_instance_id not in debug_boto_instance_ids_seen:
-            reasons.append("no corresponding machine on EC2")
+            if instance.ec2_instance_id not in debug_boto_instance_ids_seen:
+                reasons.append("no corresponding machine on EC2")
 
-        if instance.ec2_instance_id in debug_not_updatable_continue:
-            reasons.append("not updatable")
+            if instance.ec2_instance_id in debug_not_updatable_continue:
+                reasons.append("not updatable")
 
-        if instance.ec2_instance_id in debug_not_in_region:
-            reasons.append("has state code %s on EC2 but not in our region"
-                           % debug_not_in_region[instance.ec2_instance_id])
+            if instance.ec2_instance_id in debug_not_in_region:
+                reasons.append("has state code %s on EC2 but not in our region"
+                               % debug_not_in_region[instance.ec2_instance_id])
 
-        if not reasons:
-            reasons.append("?")
+            if not reasons:
+                reasons.append("?")
 
-        logger.info("[Pool %d] Deleting instance with EC2 ID %s from our database: %s",
-                    pool.id, instance.ec2_instance_id, ", ".join(reasons))
-        instance.delete()
+            logger.info("[Pool %d] Deleting instance with EC2 ID %s from our database: %s",
+                        pool.id, instance.ec2_instance_id, ", ".join(reasons))
+        deleted_instance_pks.append(instance.pk)
+
+    if deleted_instance_pks:
+        Instance.objects.filter(pk__in=deleted_instance_pks).delete()
 
     if instances_created:
         # Delete certain warnings we might have created earlier that no longer apply
 
         # If we ever exceeded the maximum spot instance count, we can clear
         # the warning now because we obviously succeeded in starting some instances.
+        # The same holds for temporary failures of any sort.
         PoolStatusEntry.objects.filter(
-            pool=pool, type=POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded']).delete()
-
-        # The same holds for temporary failures of any sort
-        PoolStatusEntry.objects.filter(pool=pool, type=POOL_STATUS_ENTRY_TYPE['temporary-failure']).delete()
+            pool=pool, type__in=[POOL_STATUS_ENTRY_TYPE['max-spot-instance-count-exceeded'],
+                                 POOL_STATUS_ENTRY_TYPE['temporary-failure']]).delete()
 
         # Do not delete unclassified errors here for now, so the user can see them.
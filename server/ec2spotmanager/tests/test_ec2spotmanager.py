@@ -16,6 +16,8 @@ import requests
 from django.core.urlresolvers import reverse
 
 from . import TestCase
+from ..models import INSTANCE_STATE, INSTANCE_STATE_CODE, POOL_STATUS_ENTRY_TYPE, POOL_STATUS_ENTRY_TYPE_CODE, \
+    get_instance_state_name
 
 
 log = logging.getLogger("fm.ec2spotmanager.tests.ec2spotmanager")  # pylint: disable=invalid-name
@@ -39,3 +41,15 @@ class EC2SpotManagerTests(TestCase):
         log.debug(response)
         response = self.client.get(index)
         self.assertRedirects(response, '/login/?next=' + index)
+
+    def test_instance_state_name(self):
+        """Status code lookup table agrees with INSTANCE_STATE_CODE"""
+        for code, name in INSTANCE_STATE_CODE.items():
+            self.assertEqual(get_instance_state_name(code), name)
+        for code in (-2, 1, 81, 272):
+            self.assertIsNone(get_instance_state_name(code))
+
+    def test_state_maps(self):
+        """Reverse lookup maps are the exact inverse of the code maps"""
+        self.assertEqual(INSTANCE_STATE, {val: key for key, val in INSTANCE_STATE_CODE.items()})
+        self.assertEqual(POOL_STATUS_ENTRY_TYPE, {val: key for key, val in POOL_STATUS_ENTRY_TYPE_CODE.items()})
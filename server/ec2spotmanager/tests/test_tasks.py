@@ -0,0 +1,252 @@
+'''
+Tests for EC2SpotManager tasks.
+
+@license:
+
+This Source Code Form is subject to the terms of the Mozilla Public
+License, v. 2.0. If a copy of the MPL was not distributed with this
+file, You can obtain one at http://mozilla.org/MPL/2.0/.
+'''
+
+import json
+import logging
+import threading
+
+import boto.ec2.instance
+import boto.exception
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from . import TestCase
+from .. import tasks
+from ..models import FlatObject, Instance, INSTANCE_STATE, PoolStatusEntry, POOL_STATUS_ENTRY_TYPE
+
+
+log = logging.getLogger("fm.ec2spotmanager.tests.tasks")  # pylint: disable=invalid-name
+
+
+def _boto_instance(instance_id, state_code, hostname=None, updatable=True):
+    """Create a boto instance like the ones returned by EC2Manager"""
+    instance = boto.ec2.instance.Instance()
+    instance.id = instance_id
+    instance.public_dns_name = hostname
+    instance._state = boto.ec2.instance.InstanceState(state_code)  # pylint: disable=protected-access
+    if updatable:
+        instance.tags[tasks.SPOTMGR_TAG_UPDATABLE] = "1"
+    return instance
+
+
+class FakeEC2(object):
+    """Records the calls we make on the boto connection of an EC2Manager"""
+
+    def __init__(self):
+        self.tagged = []
+
+    def create_tags(self, resource_ids, tags):
+        self.tagged.append((list(resource_ids), tags))
+
+
+class FakeCluster(object):
+    """Stands in for a laniakea EC2Manager connected to one region"""
+
+    def __init__(self, spot_results=None, instances=(), error=None):
+        self.spot_results = spot_results or {}
+        self.instances = list(instances)
+        self.error = error
+        self.ec2 = FakeEC2()
+        self.queries = 0
+        self.query_threads = set()
+
+    def _query(self):
+        self.queries += 1
+        self.query_threads.add(threading.current_thread().ident)
+        if self.error is not None:
+            raise self.error
+
+    def check_spot_requests(self, requests, tags=None):
+        self._query()
+        return [self.spot_results.get(request) for request in requests]
+
+    def find(self, filters=None):
+        self._query()
+        return self.instances
+
+    def retry_on_ec2_error(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class FakeRedis(object):
+    """Stands in for the redis client returned by get_redis"""
+
+    def __init__(self, data=None):
+        self.data = dict(data or {})
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+
+class TaskTestCase(TestCase):
+
+    def patch(self, obj, name, value):
+        old_value = getattr(obj, name)
+        setattr(obj, name, value)
+        self.addCleanup(setattr, obj, name, old_value)
+
+    def use_clusters(self, clusters):
+        self.patch(tasks, "_get_cluster", clusters.__getitem__)
+
+    def use_redis(self, data=None):
+        redis = FakeRedis(data)
+        self.patch(tasks, "get_redis", lambda: redis)
+        return redis
+
+
+class UpdatePoolInstancesTests(TaskTestCase):
+
+    def setUp(self):
+        super(UpdatePoolInstancesTests, self).setUp()
+        self.use_redis()
+        self.pool = self.create_pool(self.create_config(name="config #1"))
+        self.config = FlatObject({"ec2_tags": {}})
+
+    def test_fulfilled_requests(self):
+        """Fulfilled spot requests are saved and tagged as updatable"""
+        self.create_instance(None, pool=self.pool, status_code=INSTANCE_STATE['requested'],
+                             ec2_instance_id="sir-1", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        cluster = FakeCluster(spot_results={"sir-1": _boto_instance("i-1", 16, hostname="host1")},
+                              instances=[_boto_instance("i-1", 16, hostname="host1")])
+        self.use_clusters({"us-east-1": cluster})
+        tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        instance = Instance.objects.get(pool=self.pool)
+        self.assertEqual(instance.ec2_instance_id, "i-1")
+        self.assertEqual(instance.hostname, "host1")
+        self.assertEqual(instance.status_code, INSTANCE_STATE['running'])
+        self.assertEqual(cluster.ec2.tagged, [(["i-1"], {tasks.SPOTMGR_TAG_UPDATABLE: "1"})])
+        self.assertEqual(self.config.ec2_tags[tasks.SPOTMGR_TAG_POOL_ID], str(self.pool.pk))
+
+    def test_tag_batches(self):
+        """Fulfilled instances are tagged in batches of 1000 and not mistaken for leftover instances"""
+        Instance.objects.bulk_create([Instance(pool=self.pool, status_code=INSTANCE_STATE['requested'],
+                                               ec2_instance_id="sir-%d" % (idx,), ec2_region="us-east-1",
+                                               ec2_zone="us-east-1a")
+                                      for idx in range(1001)])
+        self.create_instance("host", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-old", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        cluster = FakeCluster(spot_results={"sir-%d" % (idx,): _boto_instance("i-%d" % (idx,), 16)
+                                            for idx in range(1001)})
+        self.use_clusters({"us-east-1": cluster})
+        tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        self.assertEqual([len(ids) for (ids, _) in cluster.ec2.tagged], [1000, 1])
+        self.assertEqual(set(sum((ids for (ids, _) in cluster.ec2.tagged), [])),
+                         {"i-%d" % (idx,) for idx in range(1001)})
+        for (_, tags) in cluster.ec2.tagged:
+            self.assertEqual(tags, {tasks.SPOTMGR_TAG_UPDATABLE: "1"})
+        # EC2 returned none of our instances (the new ones are not visible yet), which removes
+        # the old instance, but must not remove the instances that were just fulfilled.
+        self.assertFalse(Instance.objects.filter(ec2_instance_id="i-old").exists())
+        self.assertEqual(Instance.objects.filter(pool=self.pool, status_code=INSTANCE_STATE['running']).count(),
+                         1001)
+
+    def test_state_changes(self):
+        """Changed instance states are written with one UPDATE per state"""
+        for instance_id in ("i-1", "i-2", "i-3"):
+            self.create_instance("host", pool=self.pool, status_code=INSTANCE_STATE['pending'],
+                                 ec2_instance_id=instance_id, ec2_region="us-east-1", ec2_zone="us-east-1a")
+        cluster = FakeCluster(instances=[_boto_instance("i-1", 16), _boto_instance("i-2", 16),
+                                         _boto_instance("i-3", 0)])
+        self.use_clusters({"us-east-1": cluster})
+        with CaptureQueriesContext(connection) as queries:
+            tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        states = dict(Instance.objects.filter(pool=self.pool).values_list('ec2_instance_id', 'status_code'))
+        self.assertEqual(states, {"i-1": INSTANCE_STATE['running'], "i-2": INSTANCE_STATE['running'],
+                                  "i-3": INSTANCE_STATE['pending']})
+
+    def test_missing_instances(self):
+        """Instances that EC2 no longer knows are deleted, those that are not updatable yet are kept"""
+        self.create_instance("host1", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-1", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        self.create_instance("host2", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-2", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        cluster = FakeCluster(instances=[_boto_instance("i-2", 16, updatable=False)])
+        self.use_clusters({"us-east-1": cluster})
+        tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        self.assertEqual(list(Instance.objects.filter(pool=self.pool).values_list('ec2_instance_id', flat=True)),
+                         ["i-2"])
+        self.assertFalse(PoolStatusEntry.objects.filter(pool=self.pool).exists())
+
+    def test_unknown_instance(self):
+        """A running EC2 instance that is not in our database is reported without stopping the pool"""
+        self.create_instance("host1", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-1", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        cluster = FakeCluster(instances=[_boto_instance("i-9", 16)])
+        self.use_clusters({"us-east-1": cluster})
+        tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        entry = PoolStatusEntry.objects.get(pool=self.pool)
+        self.assertEqual(entry.type, POOL_STATUS_ENTRY_TYPE['unclassified'])
+        self.assertFalse(entry.isCritical)
+        self.assertIn("i-9", entry.msg)
+        # the update stopped before deleting anything
+        self.assertEqual(Instance.objects.filter(pool=self.pool).count(), 1)
+
+    def test_region_failure(self):
+        """A failing region is reported, while all regions are still queried (in worker threads)"""
+        self.create_instance("host1", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-1", ec2_region="us-east-1", ec2_zone="us-east-1a")
+        self.create_instance("host2", pool=self.pool, status_code=INSTANCE_STATE['running'],
+                             ec2_instance_id="i-2", ec2_region="us-west-2", ec2_zone="us-west-2a")
+        failing = FakeCluster(error=boto.exception.EC2ResponseError(503, "Service Unavailable"))
+        working = FakeCluster(instances=[_boto_instance("i-2", 16)])
+        self.use_clusters({"us-east-1": failing, "us-west-2": working})
+        tasks._update_pool_instances(self.pool, self.config)  # pylint: disable=protected-access
+        self.assertEqual(failing.queries, 1)
+        self.assertEqual(working.queries, 1)
+        self.assertNotIn(threading.current_thread().ident, failing.query_threads | working.query_threads)
+        entry = PoolStatusEntry.objects.get(pool=self.pool)
+        self.assertEqual(entry.type, POOL_STATUS_ENTRY_TYPE['temporary-failure'])
+        self.assertFalse(entry.isCritical)
+        # nothing is deleted based on incomplete information
+        self.assertEqual(Instance.objects.filter(pool=self.pool).count(), 2)
+
+
+class BestRegionZoneTests(TaskTestCase):
+
+    def setUp(self):
+        super(BestRegionZoneTests, self).setUp()
+        self.use_redis({
+            # us-east-1c is the cheapest zone, but blacklisted for c5.large
+            "ec2spot:price:c5.large": json.dumps({
+                "us-east-1": {"us-east-1b": [0.2, 0.3, 0.1], "us-east-1c": [0.02]},
+                "us-west-2": {"us-west-2a": [0.01]},
+            }),
+            # c5.xlarge has twice the cores, so this costs the same per core as c5.large in us-east-1b
+            "ec2spot:price:c5.xlarge": json.dumps({
+                "us-east-1": {"us-east-1b": [0.4, 0.6, 0.2], "us-east-1d": [8.0]},
+            }),
+            "ec2spot:blacklist:us-east-1c:c5.large": "",
+            # there is no price data for m4.large
+        })
+
+    @staticmethod
+    def get_config(instance_types):
+        return FlatObject({"ec2_instance_types": instance_types, "ec2_allowed_regions": ["us-east-1"],
+                           "ec2_max_price": 1.0})
+
+    def test_best_zone(self):
+        """Blacklisted zones, zones over the maximum price and types without prices are skipped"""
+        config = self.get_config(["m4.large", "c5.large", "c5.xlarge"])
+        result = tasks._get_best_region_zone(config)  # pylint: disable=protected-access
+        self.assertEqual(result, ("us-east-1", "us-east-1b", "c5.large", {"us-east-1d": 2.0}))
+
+    def test_tie(self):
+        """Of several zones with the same median price per core, the first one found wins"""
+        config = self.get_config(["c5.xlarge", "c5.large"])
+        result = tasks._get_best_region_zone(config)  # pylint: disable=protected-access
+        self.assertEqual(result[:3], ("us-east-1", "us-east-1b", "c5.xlarge"))
+
+    def test_no_zone(self):
+        """Without any usable price data, no zone is selected"""
+        config = self.get_config(["m4.large"])
+        result = tasks._get_best_region_zone(config)  # pylint: disable=protected-access
+        self.assertEqual(result, (None, None, None, {}))
@@ -1,15 +1,12 @@
 import json
 from chartjs.colors import next_color
 from chartjs.views.base import JSONView
-from django.conf import settings
 from django.core.exceptions import SuspiciousOperation
 from django.core.files.base import ContentFile
 from django.db.models.aggregates import Count
 from django.http.response import Http404  # noqa
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.timezone import now, timedelta
-import fasteners
-import redis
 from operator import attrgetter
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication, TokenAuthentication
@@ -18,10 +15,11 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .models import InstancePool, PoolConfiguration, Instance, \
-    INSTANCE_STATE_CODE, INSTANCE_STATE, PoolStatusEntry
+    INSTANCE_STATE, PoolStatusEntry, get_instance_state_name
 from .models import PoolUptimeDetailedEntry, PoolUptimeAccumulatedEntry
 from .serializers import MachineStatusSerializer
 from .common.ec2 import CORES_PER_INSTANCE
+from .common.redis_client import get_pool_lock, get_redis, release_pool_lock
 
 from server.views import deny_restricted_users
 
@@ -87,9 +85,8 @@ def viewPool(request, poolid):
     instances = Instance.objects.filter(pool=poolid)
 
     for instance in instances:
-        if instance.status_code in INSTANCE_STATE_CODE:
-            instance.status_code_text = INSTANCE_STATE_CODE[instance.status_code]
-        else:
+        instance.status_code_text = get_instance_state_name(instance.status_code)
+        if instance.status_code_text is None:
             instance.status_code_text = "Unknown (%s)" % instance.status_code
 
     cyclic = pool.config.isCyclic()
@@ -116,7 +113,7 @@ def viewPool(request, poolid):
 
 @deny_restricted_users
 def viewPoolPrices(request, poolid):
-    cache = redis.StrictRedis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+    cache = get_redis()
 
     pool = get_object_or_404(InstancePool, pk=poolid)
     config = pool.config.flatten()
@@ -130,13 +127,13 @@ def viewPoolPrices(request, poolid):
         if prices is None:
             continue
         prices = json.loads(prices)
-        for region in prices:
+        for (region, region_prices) in prices.items():
             if region not in allowed_regions:
                 continue
-            for zone in prices[region]:
+            for (zone, zone_prices) in region_prices.items():
                 zones.add(zone)
                 latest_price_by_zone[zone] = min(latest_price_by_zone.get(zone, 9999),
-                                                 prices[region][zone][0] / CORES_PER_INSTANCE[instance_type])
+                                                 zone_prices[0] / CORES_PER_INSTANCE[instance_type])
 
     prices = []
     for zone in sorted(zones):
@@ -441,7 +438,7 @@ def deletePool(request, poolid):
                               'Please wait for their termination first.')})
 
     if request.method == 'POST':
-        lock = fasteners.InterProcessLock('/tmp/ec2spotmanager.pool%s.lck' % poolid)
+        lock = get_pool_lock(poolid)
 
         if not lock.acquire(blocking=False):
             return render(request, 'pools/error.html', {
@@ -450,7 +447,7 @@ def deletePool(request, poolid):
         try:
             pool.delete()
         finally:
-            lock.release()
+            release_pool_lock(lock)
 
         return redirect('ec2spotmanager:pools')
 
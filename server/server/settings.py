@@ -166,6 +166,9 @@ DATABASES = {
     #        'OPTIONS': {
     #            'read_default_file': '/path/to/my.cnf',
     #        },
+    #        # Keep connections open between requests and Celery tasks,
+    #        # instead of connecting to the database again every time.
+    #        'CONN_MAX_AGE': 600,
     #    }
 }
 
@@ -288,6 +291,14 @@ SIGNATURE_STORAGE = os.path.join(BASE_DIR)
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
+# Upper limit on the number of redis connections each process may open at the same
+# time (unlimited if not set). When the limit is reached, further clients wait for
+# a connection to become free instead of opening a new one.
+# REDIS_MAX_CONNECTIONS = 50
+
+# Seconds after which the lock of an EC2SpotManager pool expires, should a pool
+# check never release it. Must be longer than the slowest pool check.
+# POOL_LOCK_TIMEOUT = 15 * 60
 
 # Celery configuration
 # USE_CELERY = True
@@ -298,6 +309,7 @@ REDIS_DB = 0
 # CELERY_TASK_ROUTES = {
 #     'crashmanager.cron.*': {'queue': 'cron'},
 #     'ec2spotmanager.cron.*': {'queue': 'cron'},
+#     'ec2spotmanager.tasks.check_instance_pool': {'queue': 'ec2spot'},
 # }
 # CELERY_BEAT_SCHEDULE = {
 #     'Poll Bugzilla every 15 minutes': {
@@ -10,6 +10,11 @@ import json
 from rest_framework import filters
 import six
 
+try:
+    from functools import lru_cache
+except ImportError:  # Python 2
+    from backports.functools_lru_cache import lru_cache
+
 from crashmanager.models import User
 
 
@@ -70,6 +75,15 @@ def paginate_requested_list(request, entries):
     return page_entries
 
 
+# Only query strings up to this length have their parsed form cached
+JSON_QUERY_CACHE_MAX_LENGTH = 4096
+
+
+@lru_cache(maxsize=256)
+def _parse_json_query(json_str):
+    return json.loads(json_str, object_pairs_hook=collections.OrderedDict)
+
+
 def json_to_query(json_str):
     """
     This method converts JSON objects into trees of Django Q objects.
@@ -93,9 +107,16 @@ def json_to_query(json_str):
     If the operator is "NOT", then only one other key can be present in the
     object. If the operator is "AND" or "OR" and only one other key is present,
     then the operator has no effect.
+
+    The same queries tend to be issued repeatedly (e.g. by auto-refreshing
+    views), so the decoded JSON is cached. The returned object is shared
+    between calls and must not be modified.
     """
     try:
-        obj = json.loads(json_str, object_pairs_hook=collections.OrderedDict)  # noqa
+        if len(json_str) <= JSON_QUERY_CACHE_MAX_LENGTH:
+            obj = _parse_json_query(json_str)
+        else:
+            obj = json.loads(json_str, object_pairs_hook=collections.OrderedDict)  # noqa
     except ValueError as e:
         raise RuntimeError("Invalid JSON: %s" % e)
 
@@ -114,8 +135,7 @@ def json_to_query(json_str):
                 raise RuntimeError("No operator specified in query object")
 
         op = obj["op"]
-        objkeys = obj.keys()
-        objkeys.remove("op")
+        objkeys = [objkey for objkey in obj.keys() if objkey != "op"]
 
         if op == 'NOT' and len(objkeys) > 1:
             raise RuntimeError("Attempted to negate multiple objects at once")
@@ -163,7 +183,7 @@ class SimpleQueryFilterBackend(filters.BaseFilterBackend):
         Return a filtered queryset.
         """
         # Return early on empty queryset
-        if not queryset:
+        if not queryset.exists():
             return queryset
 
         querystr = request.query_params.get('squery', None)